@@ -0,0 +1,78 @@
+"""
+Shared Spark session and badges I/O helpers.
+
+badges_analysis.py and badges_cleaning.py used to carry identical copies
+of the session builder and XML loader, and running them back-to-back
+started two JVMs and parsed Badges.xml twice. This module owns a single
+session plus a Parquet-backed loader, so the StAX parse of the raw XML
+happens at most once per dataset.
+"""
+
+from pyspark.sql import SparkSession
+from pyspark.sql.types import (
+    StructType, StructField, IntegerType, LongType,
+    StringType, BooleanType, TimestampType
+)
+import os
+
+
+# Hand-coded schema for Badges.xml - passing it to the reader skips the
+# full inference pre-pass spark-xml would otherwise make over the file.
+BADGES_SCHEMA = StructType([
+    StructField("_Id", LongType()),
+    StructField("_UserId", LongType()),
+    StructField("_Name", StringType()),
+    StructField("_Date", TimestampType()),
+    StructField("_Class", IntegerType()),
+    StructField("_TagBased", BooleanType())
+])
+
+_spark = None
+
+
+def get_spark(app_name="Badges Pipeline"):
+    """Get or create the shared Spark session (one JVM per process)."""
+    global _spark
+    if _spark is None:
+        _spark = SparkSession.builder \
+            .appName(app_name) \
+            .master("local[*]") \
+            .config("spark.driver.memory", "12g") \
+            .config("spark.sql.execution.arrow.pyspark.enabled", "true") \
+            .config("spark.sql.execution.arrow.pyspark.fallback.enabled", "true") \
+            .getOrCreate()
+    return _spark
+
+
+def load_badges_xml(spark, file_path):
+    """Load Badges XML file into DataFrame."""
+    # A single XML file yields very few input partitions, leaving most
+    # local[*] cores idle; repartition so downstream work is parallel.
+    # ignoreSurroundingSpaces costs extra StAX state transitions per field
+    # and the callers trim where it matters anyway.
+    return spark.read \
+        .format("xml") \
+        .option("rowTag", "row") \
+        .option("ignoreSurroundingSpaces", "false") \
+        .option("mode", "DROPMALFORMED") \
+        .option("timestampFormat", "yyyy-MM-dd'T'HH:mm:ss.SSS") \
+        .schema(BADGES_SCHEMA) \
+        .load(file_path) \
+        .repartition(spark.sparkContext.defaultParallelism * 2)
+
+
+def load_badges(spark, xml_path, parquet_cache):
+    """
+    Load the raw badges dataset, preferring the Parquet cache.
+
+    On the first call the XML is parsed once and written to parquet_cache,
+    so later runs (and the other script) skip the StAX parse entirely and
+    read the compact columnar copy instead.
+    """
+    if not os.path.exists(parquet_cache):
+        print(f"Parquet cache not found, parsing XML: {xml_path}")
+        df = load_badges_xml(spark, xml_path)
+        df.write.mode("overwrite").option("compression", "zstd").parquet(parquet_cache)
+
+    print(f"Reading badges from Parquet cache: {parquet_cache}")
+    return spark.read.parquet(parquet_cache)